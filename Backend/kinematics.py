@@ -0,0 +1,105 @@
+"""
+Cinemática de la base mecanum de RoboMesha.
+Convierte movimientos (x, y, rotation) en velocidades para los 4 motores del driver Hiwonder.
+"""
+import numpy as np
+
+# Matriz de mezcla mecanum: velocidades = MIXER @ [x, y, rotation]
+# Derivada de los comandos discretos calibrados en el robot:
+# adelante = [+, +, +, +], derecha = [-, +, +, -], giro_der = [+, -, +, -]
+MIXER = np.array([
+    [-1.0, 1.0,  1.0],  # M1
+    [ 1.0, 1.0, -1.0],  # M2
+    [ 1.0, 1.0,  1.0],  # M3
+    [-1.0, 1.0, -1.0],  # M4
+])
+
+# Dirección (x, y, rotation) de cada comando discreto
+DIRECCIONES = {
+    "stop": (0, 0, 0),
+    "adelante": (0, 1, 0),
+    "atras": (0, -1, 0),
+    "izquierda": (-1, 0, 0),
+    "derecha": (1, 0, 0),
+    "giro_izq": (0, 0, -1),
+    "giro_der": (0, 0, 1),
+    "diag_izq_arr": (-1, 1, 0),
+    "diag_der_arr": (1, 1, 0),
+    "diag_izq_abj": (-1, -1, 0),
+    "diag_der_abj": (1, -1, 0)
+}
+
+class Kinematics:
+    """
+    Mezclador mecanum con desaturación proporcional y ganancias de calibración por motor.
+    Los frames de los comandos discretos se precalculan y solo se reconstruyen
+    cuando cambia la velocidad.
+    """
+    def __init__(self, speed=60, gains=(1.0, 1.0, 1.0, 1.0)):
+        self.gains = np.asarray(gains, dtype=float)
+        self.speed = None
+        self.frames = {}  # {accion: [m1, m2, m3, m4]}
+        self.set_speed(speed)
+
+    def set_speed(self, speed):
+        """Actualiza la velocidad (0-100) y recalcula los frames de los comandos discretos."""
+        speed = max(0, min(100, int(speed)))
+        if speed == self.speed:
+            return
+        self.speed = speed
+        directions = np.array(list(DIRECCIONES.values()), dtype=float)
+        frames = self.mix_batch(directions)
+        self.frames = {accion: frame.tolist() for accion, frame in zip(DIRECCIONES, frames)}
+
+    def mix(self, x, y, rotation, speed=None):
+        """
+        Velocidades [m1, m2, m3, m4] para un movimiento (x, y, rotation) entre -1 y 1.
+        """
+        return self.mix_batch(np.array([[x, y, rotation]], dtype=float), speed)[0].tolist()
+
+    def mix_batch(self, samples, speed=None):
+        """
+        Evalúa muchos movimientos a la vez (trayectorias o sesiones grabadas).
+        samples: arreglo (N, 3) con columnas x, y, rotation.
+        speed: velocidad escalar o arreglo (N,); por defecto la velocidad actual.
+        Devuelve un arreglo (N, 4) de enteros entre -100 y 100.
+
+        Si la mezcla pide más que la velocidad (o algún motor supera 100 por las
+        ganancias), se escalan los 4 motores por el mismo factor para conservar
+        la dirección del movimiento.
+        """
+        samples = np.clip(np.asarray(samples, dtype=float).reshape(-1, 3), -1.0, 1.0)
+        speed = self.speed if speed is None else np.clip(np.asarray(speed, dtype=float), 0, 100)
+
+        wheels = samples @ MIXER.T
+        peak = np.max(np.abs(wheels), axis=1, keepdims=True)
+        wheels /= np.maximum(peak, 1.0)
+
+        velocities = wheels * np.reshape(speed, (-1, 1)) * self.gains
+        # Las ganancias pueden llevar algún motor por encima de 100: desaturar de nuevo
+        peak = np.max(np.abs(velocities), axis=1, keepdims=True)
+        velocities *= 100.0 / np.maximum(peak, 100.0)
+        return np.clip(np.rint(velocities), -100, 100).astype(int)
+
+def samples_from_messages(messages):
+    """
+    Convierte mensajes de conversación (ver ConversationHistory) en muestras para mix_batch.
+    Acepta comandos de movimiento ({"type": "movement", "data": {...}}) y
+    comandos discretos ({"type": "command", "action": ...}).
+    Devuelve (timestamps, samples) como arreglos (N,) y (N, 3).
+    """
+    timestamps = []
+    samples = []
+    for message in messages:
+        payload = message.get('payload', {})
+        if payload.get('type') == 'movement':
+            data = payload.get('data', {})
+            sample = (data.get('x', 0), data.get('y', 0), data.get('rotation', 0))
+        elif payload.get('type') == 'command' and payload.get('action') in DIRECCIONES:
+            sample = DIRECCIONES[payload['action']]
+        else:
+            continue
+        timestamps.append(message.get('ts', 0.0))
+        samples.append(sample)
+
+    return np.array(timestamps, dtype=float), np.array(samples, dtype=float).reshape(-1, 3)
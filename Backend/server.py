@@ -7,12 +7,15 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 try:
-    from smbus2 import SMBus
+    from smbus2 import SMBus, i2c_msg
 except ImportError:
     # Fallback para sistemas que no tienen smbus2 instalado
     SMBus = None
+    i2c_msg = None
 import time
 import struct
+from typing import Optional
+from kinematics import Kinematics
 
 # --- CONFIGURACIÓN I2C OFICIAL ---
 # Basado en [cite: 92, 93]
@@ -25,6 +28,11 @@ MOTOR_TYPE_ADDR = 0x14
 MOTOR_ENCODER_POLARITY_ADDR = 0x15 
 MOTOR_FIXED_PWM_ADDR = 0x1F 
 MOTOR_FIXED_SPEED_ADDR = 0x33 # Control de velocidad (Closed Loop) [cite: 99]
+MOTOR_ENCODER_TOTAL_ADDR = 0x3C # Conteo acumulado de los 4 encoders (4 x int32)
+
+# Telemetría: lecturas que viajan en la misma transacción I2C que la escritura de velocidades
+BATTERY_READ_INTERVAL = 5.0  # Segundos entre lecturas de batería
+ENCODER_READ_INTERVAL = 0.5  # Segundos entre lecturas de encoders
 
 # Configuración de Motores JGB37-520 (Mecanum)
 # [cite: 111, 112]
@@ -36,10 +44,23 @@ MOTOR_ENCODER_POLARITY = 0
 # La velocidad se mapea desde niveles 1-5 (20%, 40%, 60%, 80%, 100%)
 VELOCIDAD = 60  # Valor por defecto (nivel 3 = 60%) 
 
+# Ganancias de calibración por motor [M1, M2, M3, M4] (1.0 = sin corrección)
+# Subir la ganancia de un motor que gira más lento que los demás.
+MOTOR_GAINS = [1.0, 1.0, 1.0, 1.0]
+
 class HiwonderDriver:
     def __init__(self):
         self.bus = None
         self.simulation_mode = False
+        self.pending_reads = []  # [(registro, longitud, callback)] para la próxima escritura
+        self.telemetria = {
+            'battery_mv': None,  # Voltaje de batería en mV
+            'encoders': None,  # Conteo de encoders [m1, m2, m3, m4]
+            'updated_at': None
+        }
+        self.last_battery_read = 0.0
+        self.last_encoder_read = 0.0
+        self.last_transaction = 0.0  # Última transacción I2C exitosa
         try:
             if SMBus is None:
                 raise ImportError("smbus2 no está instalado")
@@ -67,88 +88,193 @@ class HiwonderDriver:
         """
         Envía el array de 4 velocidades al registro 0x33 (Fixed Speed).
         velocidades: lista de 4 enteros [m1, m2, m3, m4] con valores entre -100 y 100.
+        La siguiente lectura programada con schedule_read viaja en la misma transacción.
+        """
+        self._schedule_telemetry()
+
+        # Nunca adjuntar lecturas a un paro: una lectura fallida no debe arriesgar el stop
+        if not any(velocidades):
+            self.transaction(velocidades)
+            return
+
+        self.transaction(velocidades, self._next_reads())
+
+    def refresh_telemetry(self):
+        """
+        Con el robot detenido no hay escrituras a las que adjuntar lecturas:
+        si no hubo transacciones en BATTERY_READ_INTERVAL, leer sin escribir velocidades.
+        """
+        if self.simulation_mode or time.time() - self.last_transaction < BATTERY_READ_INTERVAL:
+            return
+        self._schedule_telemetry()
+        while self.pending_reads:
+            self.transaction(None, self._next_reads())
+
+    def _schedule_telemetry(self):
+        """Programa las lecturas de batería y encoders según su cadencia."""
+        now = time.time()
+        pending = {register for register, _, _ in self.pending_reads}
+        if now - self.last_battery_read >= BATTERY_READ_INTERVAL and ADC_BAT_ADDR not in pending:
+            self.last_battery_read = now
+            self.schedule_read(ADC_BAT_ADDR, 2, self._update_battery)
+        if now - self.last_encoder_read >= ENCODER_READ_INTERVAL and MOTOR_ENCODER_TOTAL_ADDR not in pending:
+            self.last_encoder_read = now
+            self.schedule_encoder_read()
+
+    def _next_reads(self):
+        """
+        Una sola lectura por transacción y siempre como último mensaje: algunos
+        controladores (i2c-bcm2835 en Pi <= 4) rechazan lecturas intermedias.
+        """
+        if not self.pending_reads:
+            return []
+        return [self.pending_reads.pop(0)]
+
+    def schedule_read(self, register, length, callback):
+        """
+        Programa la lectura de un registro para la próxima escritura de velocidades.
+        callback recibe los bytes leídos.
+        """
+        self.pending_reads.append((register, length, callback))
+
+    def schedule_encoder_read(self):
+        """Programa la lectura de los encoders para la próxima escritura de velocidades."""
+        self.schedule_read(MOTOR_ENCODER_TOTAL_ADDR, 16, self._update_encoders)
+
+    def transaction(self, velocidades=None, reads=()):
+        """
+        Escribe las velocidades (opcional) y hace las lecturas en una sola llamada
+        i2c_rdwr (mensajes combinados con repeated start, una sola llamada al kernel).
+        reads: lista de (registro, longitud, callback).
         """
         if self.simulation_mode:
-            print(f"[SIMULACIÓN] Enviando velocidades a motores: {velocidades}")
+            if velocidades is not None:
+                print(f"[SIMULACIÓN] Enviando velocidades a motores: {velocidades}")
+            return
+
+        messages = []
+        if velocidades is not None:
+            # Velocidades como int8 (complemento a 2), precedidas por el registro
+            data = struct.pack('<4b', *velocidades)
+            messages.append(i2c_msg.write(MOTOR_ADDR, bytes([MOTOR_FIXED_SPEED_ADDR]) + data))
+
+        read_messages = []
+        for register, length, callback in reads:
+            # Escribir el registro y leer con repeated start
+            read_msg = i2c_msg.read(MOTOR_ADDR, length)
+            messages.append(i2c_msg.write(MOTOR_ADDR, [register]))
+            messages.append(read_msg)
+            read_messages.append((read_msg, callback))
+
+        if not messages:
             return
 
         try:
-            # Escribir bloque I2C al registro 0x33 (Fixed Speed)
-            self.bus.write_i2c_block_data(MOTOR_ADDR, MOTOR_FIXED_SPEED_ADDR, velocidades)
+            self.bus.i2c_rdwr(*messages)
             # NO ponemos sleep aquí para no bloquear el servidor, el driver se encarga.
+            self.last_transaction = time.time()
         except Exception as e:
-            print(f"[I2C ERROR] No se pudo enviar velocidades a los motores: {e}")
+            print(f"[I2C ERROR] Falló la transacción I2C (velocidades: {velocidades}): {e}")
+            if reads:
+                print(f"[I2C ERROR] Lecturas perdidas: {[hex(register) for register, _, _ in reads]}")
+                if velocidades is not None:
+                    # Reintentar solo la escritura de velocidades para no perder el setpoint
+                    try:
+                        self.bus.write_i2c_block_data(MOTOR_ADDR, MOTOR_FIXED_SPEED_ADDR, list(data))
+                        self.last_transaction = time.time()
+                    except Exception as e:
+                        print(f"[I2C ERROR] No se pudo enviar velocidades a los motores: {e}")
+            return
+
+        for read_msg, callback in read_messages:
+            try:
+                callback(bytes(read_msg))
+            except Exception as e:
+                print(f"[I2C ERROR] No se pudo procesar lectura: {e}")
+
+    def _update_battery(self, data):
+        self.telemetria['battery_mv'] = struct.unpack('<H', data)[0]
+        self.telemetria['updated_at'] = time.time()
+
+    def _update_encoders(self, data):
+        self.telemetria['encoders'] = list(struct.unpack('<4i', data))
+        self.telemetria['updated_at'] = time.time()
 
 # Instancia del driver
 driver = HiwonderDriver()
 
+# Cinemática: frames precalculados de los comandos y mezclador mecanum
+cinematica = Kinematics(speed=VELOCIDAD, gains=MOTOR_GAINS)
+
 # --- LÓGICA DE MOVIMIENTOS MECANUM ---
 # Asumiendo mapeo: M1=FrontIzq, M2=TrasIzq, M3=FrontDer, M4=TrasDer (Verificar cableado)
-# Si un motor gira al revés, invierte el signo aquí.
+# Si un motor gira al revés, invierte el signo de su fila en kinematics.MIXER.
+# Los frames de cada comando se recalculan solo cuando cambia la velocidad (set_speed).
 
 def detener():
     """Detiene todos los motores estableciendo velocidad 0 en todos."""
-    print(f">> DETENER - Velocidades: [0, 0, 0, 0]")
-    driver.enviar_velocidad([0, 0, 0, 0])
+    v = cinematica.frames["stop"]
+    print(f">> DETENER - Velocidades: {v}")
+    driver.enviar_velocidad(v)
 
 def adelante():
     """Mueve el robot hacia adelante: todos los motores en dirección positiva."""
-    v = [VELOCIDAD, VELOCIDAD, VELOCIDAD, VELOCIDAD] 
+    v = cinematica.frames["adelante"]
     print(f">> ADELANTE - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def atras():
     """Mueve el robot hacia atrás: todos los motores en dirección negativa."""
-    v = [-VELOCIDAD, -VELOCIDAD, -VELOCIDAD, -VELOCIDAD]
+    v = cinematica.frames["atras"]
     print(f">> ATRAS - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def derecha():
     """Mueve el robot hacia la derecha (strafe): M1(-), M2(+), M3(+), M4(-)."""
-    v = [-VELOCIDAD, VELOCIDAD, VELOCIDAD, -VELOCIDAD]
+    v = cinematica.frames["derecha"]
     print(f">> DERECHA - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def izquierda():
     """Mueve el robot hacia la izquierda (strafe): M1(+), M2(-), M3(-), M4(+)."""
-    v = [VELOCIDAD, -VELOCIDAD, -VELOCIDAD, VELOCIDAD]
+    v = cinematica.frames["izquierda"]
     print(f">> IZQUIERDA - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def giro_izquierda():
     """Gira el robot sobre su eje hacia la derecha: Izquierdos(-), Derechos(+)."""
-    v = [-VELOCIDAD, VELOCIDAD, -VELOCIDAD, VELOCIDAD]
+    v = cinematica.frames["giro_izq"]
     print(f">> GIRO DERECHA - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def giro_derecha():
     """Gira el robot sobre su eje hacia la izquierda: Izquierdos(+), Derechos(-)."""
-    v = [VELOCIDAD, -VELOCIDAD, VELOCIDAD, -VELOCIDAD]
+    v = cinematica.frames["giro_der"]
     print(f">> GIRO IZQUIERDA - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 # --- DIAGONALES (Solo mueven 2 ruedas) ---
 def diagonal_der_arriba():
     """Diagonal derecha-arriba: M1(0), M2(+), M3(+), M4(0)."""
-    v = [0, VELOCIDAD, VELOCIDAD, 0]
+    v = cinematica.frames["diag_der_arr"]
     print(f">> DIAGONAL DERECHA-ARRIBA - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def diagonal_izq_arriba():
     """Diagonal izquierda-arriba: M1(+), M2(0), M3(0), M4(+)."""
-    v = [VELOCIDAD, 0, 0, VELOCIDAD]
+    v = cinematica.frames["diag_izq_arr"]
     print(f">> DIAGONAL IZQUIERDA-ARRIBA - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def diagonal_der_abajo():
     """Diagonal derecha-abajo: M1(-), M2(0), M3(0), M4(-)."""
-    v = [-VELOCIDAD, 0, 0, -VELOCIDAD]
+    v = cinematica.frames["diag_der_abj"]
     print(f">> DIAGONAL DERECHA-ABAJO - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
 def diagonal_izq_abajo():
     """Diagonal izquierda-abajo: M1(0), M2(-), M3(-), M4(0)."""
-    v = [0, -VELOCIDAD, -VELOCIDAD, 0]
+    v = cinematica.frames["diag_izq_abj"]
     print(f">> DIAGONAL IZQUIERDA-ABAJO - Velocidades: {v}")
     driver.enviar_velocidad(v)
 
@@ -183,13 +309,28 @@ app_fastapi.add_middleware(
 @app_fastapi.get("/health")
 async def health_check():
     """Endpoint para verificar que el servidor está funcionando"""
+    # Con el robot detenido la telemetría no viaja con escrituras: leerla aquí
+    driver.refresh_telemetry()
     return {
         "status": "ok",
         "service": "RoboMesha Backend",
         "socketio": "available",
-        "i2c_mode": "simulation" if driver.simulation_mode else "real"
+        "i2c_mode": "simulation" if driver.simulation_mode else "real",
+        "telemetry": driver.telemetria
     }
 
+# Historial de conversación paginado (mismos parámetros que el evento 'history')
+@app_fastapi.get("/history/{device}")
+async def get_history(
+    device: str,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    since: Optional[float] = None,
+    limit: Optional[int] = None
+):
+    """Devuelve una página del historial de conversación de un dispositivo"""
+    return query_history(device, before=before, after=after, since=since, limit=limit)
+
 # Configurar Socket.IO con CORS explícito y opciones adicionales
 sio = socketio.AsyncServer(
     async_mode='asgi',
@@ -208,6 +349,193 @@ registered_devices = {}  # {device_name: {sid, role, last_seen}}
 # Nombre del dispositivo principal (el robot físico)
 ROBOT_DEVICE_NAME = "RoboMesha"
 
+# Tasa máxima de muestras de movimiento por operador antes de enviarle 'slow_down'
+MOVEMENT_MAX_RATE = 25  # muestras por segundo
+
+# --- HISTORIAL DE CONVERSACIÓN ---
+# Cada dispositivo guarda sus últimos mensajes en un buffer circular de tamaño fijo.
+# Los clientes lo consultan por páginas (evento 'history' o GET /history/{device})
+# en lugar de acumular cada 'conversation_message' en el navegador.
+HISTORY_CAPACITY = 250  # Mensajes guardados por dispositivo
+HISTORY_PAGE_SIZE = 50  # Tamaño de página por defecto
+HISTORY_PAGE_MAX = 250  # Tamaño máximo de página permitido
+
+class ConversationHistory:
+    """
+    Buffer circular preasignado con los mensajes de conversación de un dispositivo.
+    Cada mensaje recibe un número de secuencia 'seq' creciente que funciona como cursor.
+    """
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.next_seq = 0  # seq que recibirá el próximo mensaje
+
+    def append(self, message):
+        """Guarda el mensaje (sobrescribiendo el más antiguo si está lleno) y le asigna su seq."""
+        message['seq'] = self.next_seq
+        self.buffer[self.next_seq % self.capacity] = message
+        self.next_seq += 1
+        return message
+
+    def oldest_seq(self):
+        """seq del mensaje más antiguo que sigue en el buffer."""
+        return max(0, self.next_seq - self.capacity)
+
+    def _first_seq_after_ts(self, since):
+        """Búsqueda binaria del primer seq con ts > since (los ts son crecientes)."""
+        low, high = self.oldest_seq(), self.next_seq
+        while low < high:
+            mid = (low + high) // 2
+            if self.buffer[mid % self.capacity]['ts'] > since:
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+    def page(self, before=None, after=None, since=None, limit=HISTORY_PAGE_SIZE):
+        """
+        Devuelve una página de mensajes en orden cronológico.
+        - before: mensajes con seq < before (hacia atrás; sin cursor = los más recientes)
+        - after: mensajes con seq > after (hacia adelante)
+        - since: mensajes con ts > since (timestamp en segundos, hacia adelante)
+        'cursor' es el valor a enviar en la siguiente consulta en la misma dirección,
+        o None si ya no hay más mensajes.
+        """
+        oldest = self.oldest_seq()
+        if after is not None or since is not None:
+            start = oldest
+            if after is not None:
+                start = max(start, after + 1)
+            if since is not None:
+                start = max(start, self._first_seq_after_ts(since))
+            end = min(start + limit, self.next_seq)
+            cursor = end - 1 if end < self.next_seq else None
+        else:
+            end = self.next_seq if before is None else max(oldest, min(before, self.next_seq))
+            start = max(oldest, end - limit)
+            cursor = start if start > oldest else None
+
+        return {
+            'messages': [self.buffer[seq % self.capacity] for seq in range(start, end)],
+            'cursor': cursor,
+            'oldest_seq': oldest,
+            'latest_seq': self.next_seq - 1
+        }
+
+conversation_history = {}  # {device_name: ConversationHistory}
+
+def query_history(device, before=None, after=None, since=None, limit=None):
+    """
+    Consulta paginada del historial de un dispositivo (compartida por Socket.IO y HTTP).
+    """
+    limit = HISTORY_PAGE_SIZE if limit is None else max(1, min(HISTORY_PAGE_MAX, int(limit)))
+    history = conversation_history.get(device)
+    if history is None:
+        result = {'messages': [], 'cursor': None, 'oldest_seq': 0, 'latest_seq': -1}
+    else:
+        result = history.page(
+            before=None if before is None else int(before),
+            after=None if after is None else int(after),
+            since=None if since is None else float(since),
+            limit=limit
+        )
+    result['device'] = device
+    return result
+
+# --- CONTROL EXCLUSIVO DEL ROBOT (LEASE) ---
+# Solo un operador (el que tiene el lease) puede mover el robot o cambiar la velocidad.
+# El lease se renueva con su tráfico; los demás operadores son observadores de solo lectura.
+CONTROL_LEASE_TTL = 3.0  # Segundos sin tráfico antes de liberar el control
+
+control_lease = {'sid': None, 'device_name': None, 'expires_at': 0.0}
+lease_watchdog_running = False
+
+def control_holder_sid():
+    """Devuelve el sid del operador con el control vigente, o None."""
+    if control_lease['sid'] is not None and time.time() < control_lease['expires_at']:
+        return control_lease['sid']
+    return None
+
+def control_state():
+    """Estado del control del robot que se envía a los clientes."""
+    holder = control_holder_sid()
+    return {
+        'device': ROBOT_DEVICE_NAME,
+        'holder': control_lease['device_name'] if holder else None,
+        'ttl': CONTROL_LEASE_TTL
+    }
+
+async def broadcast_control_state():
+    """Envía el estado del control a todos los clientes."""
+    await sio.emit('control_state', control_state())
+
+async def grant_control(sid):
+    """Asigna el control al operador y arranca el watchdog de expiración."""
+    global lease_watchdog_running
+    # Un lease expirado que el watchdog aún no limpió: revocarlo (detiene el robot
+    # y avisa al operador anterior) antes de asignar el nuevo
+    if control_lease['sid'] is not None:
+        await revoke_control('expired')
+    device_name = connected_clients.get(sid, {}).get('device_name')
+    control_lease.update({
+        'sid': sid,
+        'device_name': device_name,
+        'expires_at': time.time() + CONTROL_LEASE_TTL
+    })
+    print(f"[CONTROL] Control asignado a {device_name} (sid: {sid})")
+    if not lease_watchdog_running:
+        lease_watchdog_running = True
+        sio.start_background_task(lease_watchdog)
+    await broadcast_control_state()
+
+async def revoke_control(reason, new_holder=None):
+    """
+    Retira el control al operador actual y detiene el robot.
+    reason: 'released', 'expired', 'disconnected' o 'takeover'.
+    """
+    previous_sid = control_lease['sid']
+    control_lease.update({'sid': None, 'device_name': None, 'expires_at': 0.0})
+    print(f"[CONTROL] Control liberado ({reason})")
+    detener()
+    if previous_sid is not None and previous_sid in connected_clients:
+        await sio.emit('control_revoked', {
+            'reason': reason,
+            'by': new_holder
+        }, room=previous_sid)
+    if reason != 'takeover':
+        await broadcast_control_state()
+
+async def ensure_control(sid):
+    """
+    Verifica que el operador tenga el control y renueva su lease.
+    Si nadie tiene el control, se le asigna. Si lo tiene otro operador,
+    responde con 'control_denied' y devuelve False.
+    """
+    holder = control_holder_sid()
+    if holder == sid:
+        control_lease['expires_at'] = time.time() + CONTROL_LEASE_TTL
+        return True
+    if holder is None:
+        await grant_control(sid)
+        return True
+
+    await sio.emit('control_denied', {
+        'holder': control_lease['device_name'],
+        'message': f"El control lo tiene {control_lease['device_name']}"
+    }, room=sid)
+    return False
+
+async def lease_watchdog():
+    """Libera el control (y detiene el robot) cuando el lease expira sin tráfico."""
+    global lease_watchdog_running
+    while control_lease['sid'] is not None:
+        remaining = control_lease['expires_at'] - time.time()
+        if remaining <= 0:
+            await revoke_control('expired')
+            continue
+        await sio.sleep(remaining)
+    lease_watchdog_running = False
+
 @sio.event
 async def connect(sid, environ):
     """Maneja la conexión de nuevos clientes"""
@@ -216,7 +544,10 @@ async def connect(sid, environ):
         'role': None,
         'name': None,
         'device_name': None,
-        'connected_at': time.time()
+        'connected_at': time.time(),
+        'movement_window_start': 0.0,  # Ventana de 1 s para medir la tasa de movimiento
+        'movement_count': 0,
+        'slow_down_sent': False
     }
 
 @sio.event
@@ -224,11 +555,10 @@ async def disconnect(sid):
     """Maneja la desconexión de clientes"""
     print(f"[DISCONNECT] Cliente desconectado: {sid}")
     
-    # Si era un operador, detener el robot por seguridad
-    client_info = connected_clients.get(sid, {})
-    if client_info.get('role') == 'operator':
-        print("[SEGURIDAD] Operador desconectado, deteniendo robot")
-        detener()
+    # Si tenía el control del robot, liberarlo y detener el robot por seguridad
+    if control_lease['sid'] == sid:
+        print("[SEGURIDAD] Operador con control desconectado, deteniendo robot")
+        await revoke_control('disconnected')
     
     # Limpiar registros
     if sid in connected_clients:
@@ -280,9 +610,50 @@ async def register(sid, data):
         'base_name': base_name
     }, room=sid)
     
+    # Informar quién tiene el control del robot
+    await sio.emit('control_state', control_state(), room=sid)
+    
     # Enviar lista actualizada de dispositivos
     await broadcast_device_list()
 
+@sio.event
+async def request_control(sid, data=None):
+    """
+    Solicita (o renueva) el control del robot.
+    Data esperado: {"takeover": false}
+    Con "takeover": true se le quita el control al operador actual (se detiene el robot).
+    """
+    data = data or {}
+    client_info = connected_clients.get(sid, {})
+    if client_info.get('role') != 'operator':
+        await sio.emit('error', {
+            'message': 'No autorizado: solo operadores pueden tomar el control'
+        }, room=sid)
+        return
+
+    holder = control_holder_sid()
+    if holder is None:
+        await grant_control(sid)
+    elif holder == sid:
+        control_lease['expires_at'] = time.time() + CONTROL_LEASE_TTL
+    elif data.get('takeover'):
+        print(f"[CONTROL] {client_info.get('device_name')} toma el control de {control_lease['device_name']}")
+        await revoke_control('takeover', new_holder=client_info.get('device_name'))
+        await grant_control(sid)
+    else:
+        await sio.emit('control_denied', {
+            'holder': control_lease['device_name'],
+            'message': f"El control lo tiene {control_lease['device_name']}"
+        }, room=sid)
+
+    return control_state()
+
+@sio.event
+async def release_control(sid, data=None):
+    """Libera el control del robot si lo tiene este operador."""
+    if control_holder_sid() == sid:
+        await revoke_control('released')
+
 @sio.event
 async def list_devices(sid, data=None):
     """
@@ -298,6 +669,29 @@ async def list_devices(sid, data=None):
         'devices': device_list
     }, room=sid)
 
+@sio.event
+async def history(sid, data=None):
+    """
+    Responde con una página del historial de conversación de un dispositivo.
+    Data esperado: {"device": "RoboMesha", "before": seq, "after": seq, "since": ts, "limit": n}
+    La respuesta se entrega como ack del evento.
+    """
+    data = data or {}
+    device = data.get('device')
+    if not device:
+        return {'error': 'Se requiere el campo device'}
+
+    try:
+        return query_history(
+            device,
+            before=data.get('before'),
+            after=data.get('after'),
+            since=data.get('since'),
+            limit=data.get('limit')
+        )
+    except (TypeError, ValueError):
+        return {'error': 'Parámetros de historial inválidos'}
+
 @sio.event
 async def set_speed(sid, data):
     """
@@ -314,6 +708,10 @@ async def set_speed(sid, data):
             'message': 'No autorizado: solo operadores pueden cambiar la velocidad'
         }, room=sid)
         return
+
+    # Solo el operador con el control puede cambiar la velocidad
+    if not await ensure_control(sid):
+        return
     
     # Si viene speed_level (1-5), convertir a velocidad (20%, 40%, 60%, 80%, 100%)
     if 'speed_level' in data:
@@ -331,6 +729,9 @@ async def set_speed(sid, data):
             'message': 'Formato inválido: se requiere speed_level (1-5) o speed (0-100)'
         }, room=sid)
         return
+
+    # Recalcular los frames de los comandos discretos con la nueva velocidad
+    cinematica.set_speed(VELOCIDAD)
     
     # Confirmar actualización
     await sio.emit('speed_updated', {
@@ -355,6 +756,10 @@ async def command(sid, data):
         }, room=sid)
         return
     
+    # 'stop' siempre se acepta (paro de emergencia); el resto requiere el control
+    if accion != 'stop' and not await ensure_control(sid):
+        return
+    
     print(f"[COMMAND] Comando recibido de {sid}: {accion}")
     
     if accion in COMANDOS:
@@ -384,7 +789,10 @@ async def command(sid, data):
 async def send_command(sid, data):
     """
     Envía un comando a un dispositivo específico.
-    Data esperado: {"target": "RoboMesha", "payload": {...}}
+    Data esperado: {"target": "RoboMesha", "payload": {...}, "ack": false}
+    Solo se emite 'command_sent' si el cliente lo pide con "ack": true.
+    El valor de retorno se entrega como ack de Socket.IO (si el cliente lo solicita),
+    lo que permite medir el tiempo de ida y vuelta.
     """
     target = data.get("target")
     payload = data.get("payload", {})
@@ -398,12 +806,17 @@ async def send_command(sid, data):
         }, room=sid)
         return
     
+    # Solo el operador con el control puede mover el robot
+    if target == ROBOT_DEVICE_NAME and not await ensure_control(sid):
+        return
+    
     print(f"[SEND_COMMAND] Comando a {target} desde {sid}: {payload}")
     
     # Si el target es el robot principal, procesar el comando
     if target == ROBOT_DEVICE_NAME:
         # Procesar comando de movimiento
         if payload.get('type') == 'movement':
+            await check_movement_rate(sid, client_info)
             movement_data = payload.get('data', {})
             x = movement_data.get('x', 0)
             y = movement_data.get('y', 0)
@@ -425,37 +838,41 @@ async def send_command(sid, data):
         target_sid = registered_devices[target]['sid']
         await sio.emit('command', payload, room=target_sid)
     
-    # Confirmar envío
-    await sio.emit('command_sent', {
-        'target': target,
-        'payload': payload
-    }, room=sid)
+    # Confirmar envío solo si el cliente lo pidió
+    if data.get('ack'):
+        await sio.emit('command_sent', {
+            'target': target,
+            'payload': payload
+        }, room=sid)
+
+    return {'target': target, 'status': 'sent'}
+
+async def check_movement_rate(sid, client_info):
+    """
+    Cuenta las muestras de movimiento del operador en ventanas de 1 segundo.
+    Si supera MOVEMENT_MAX_RATE, le envía una vez por ventana un 'slow_down'
+    con el intervalo mínimo sugerido entre muestras.
+    """
+    now = time.time()
+    if now - client_info.get('movement_window_start', 0.0) >= 1.0:
+        client_info['movement_window_start'] = now
+        client_info['movement_count'] = 0
+        client_info['slow_down_sent'] = False
+
+    client_info['movement_count'] = client_info.get('movement_count', 0) + 1
+    if client_info['movement_count'] > MOVEMENT_MAX_RATE and not client_info.get('slow_down_sent'):
+        client_info['slow_down_sent'] = True
+        print(f"[SLOW_DOWN] {sid} supera {MOVEMENT_MAX_RATE} muestras/s")
+        await sio.emit('slow_down', {
+            'min_interval_ms': int(1000 / MOVEMENT_MAX_RATE)
+        }, room=sid)
 
 async def process_movement_command(x, y, rotation):
     """
     Procesa comandos de movimiento con coordenadas x, y, rotation.
-    Convierte a velocidades de motores mecanum.
+    Convierte a velocidades de motores mecanum (ver kinematics.Kinematics.mix).
     """
-    # Normalizar valores
-    x = max(-1, min(1, x))
-    y = max(-1, min(1, y))
-    rotation = max(-1, min(1, rotation))
-    
-    # Calcular velocidades para cada motor (mecanum)
-    # M1=FrontIzq, M2=TrasIzq, M3=FrontDer, M4=TrasDer
-    # Fórmula mecanum: v = x + y + rotation
-    m1 = (x + y + rotation) * VELOCIDAD
-    m2 = (-x + y + rotation) * VELOCIDAD
-    m3 = (-x + y - rotation) * VELOCIDAD
-    m4 = (x + y - rotation) * VELOCIDAD
-    
-    # Limitar valores a rango [-100, 100]
-    velocidades = [
-        int(max(-100, min(100, m1))),
-        int(max(-100, min(100, m2))),
-        int(max(-100, min(100, m3))),
-        int(max(-100, min(100, m4)))
-    ]
+    velocidades = cinematica.mix(x, y, rotation)
     
     print(f"[MOVEMENT] x={x:.2f}, y={y:.2f}, rot={rotation:.2f} -> {velocidades}")
     driver.enviar_velocidad(velocidades)
@@ -471,6 +888,11 @@ async def send_conversation_message(device, direction, payload, origin):
         'origin': origin,
         'ts': time.time()
     }
+
+    # Guardar en el historial del dispositivo (asigna 'seq' al mensaje)
+    if device not in conversation_history:
+        conversation_history[device] = ConversationHistory()
+    conversation_history[device].append(message)
     
     # Broadcast a todos los clientes
     await sio.emit('conversation_message', message)
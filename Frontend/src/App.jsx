@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback, useMemo } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import Header from './components/Header';
 import SpeedDisplay from './components/SpeedDisplay';
 import MovementButtons from './components/MovementButtons';
@@ -9,6 +9,14 @@ import EmergencyButton from './components/EmergencyButton';
 import SpeedControl from './components/SpeedControl';
 import socketService from './utils/socket';
 
+// Máximo de mensajes que se mantienen en memoria mientras los logs están abiertos
+const MAX_LOG_MESSAGES = 250;
+
+const toLogEntry = (msg) => ({
+  ...msg,
+  ts: typeof msg.ts === 'number' ? msg.ts * 1000 : Date.now(),
+});
+
 function App() {
   const [speed, setSpeed] = useState(0);
   const [direction, setDirection] = useState(45);
@@ -19,7 +27,9 @@ function App() {
   const [isConnected, setIsConnected] = useState(false);
   const [devices, setDevices] = useState([]);
   const [selectedDevice, setSelectedDevice] = useState('');
-  const [conversations, setConversations] = useState({});
+  const [logMessages, setLogMessages] = useState([]);
+  const [historyOldestSeq, setHistoryOldestSeq] = useState(null); // seq más antiguo que conserva el backend
+  const [historyLoading, setHistoryLoading] = useState(false);
   const [isLogsOpen, setIsLogsOpen] = useState(false);
   const [movementLocked, setMovementLocked] = useState(false);
   const [rotationLocked, setRotationLocked] = useState(false);
@@ -27,6 +37,7 @@ function App() {
   const [emergencyStopActive, setEmergencyStopActive] = useState(false);
   const [activeMovement, setActiveMovement] = useState(null);
   const [activeRotation, setActiveRotation] = useState(null);
+  const [controlHolder, setControlHolder] = useState(null);
 
   const handleDeviceList = useCallback(
     (data = {}) => {
@@ -45,29 +56,94 @@ function App() {
     [selectedDevice]
   );
 
+  // Dispositivo cuyos logs están abiertos (null si el modal está cerrado).
+  // El historial vive en el backend: solo se guardan mensajes en vivo mientras se ven.
+  const logsDeviceRef = useRef(null);
+
   const handleConversationMessage = useCallback((msg = {}) => {
-    const { device, direction, payload, ts, origin } = msg;
-    if (!device) {
+    const { device, seq } = msg;
+    if (!device || device !== logsDeviceRef.current) {
+      return;
+    }
+
+    setLogMessages(prev => {
+      // Ignorar duplicados que ya llegaron en una página del historial
+      const last = prev[prev.length - 1];
+      if (last && typeof seq === 'number' && typeof last.seq === 'number' && seq <= last.seq) {
+        return prev;
+      }
+      // Los mensajes recortados se pueden recuperar con "Cargar mensajes anteriores"
+      const next = [...prev, toLogEntry(msg)];
+      return next.length > MAX_LOG_MESSAGES ? next.slice(next.length - MAX_LOG_MESSAGES) : next;
+    });
+  }, []);
+
+  useEffect(() => {
+    if (!isLogsOpen || !selectedDevice || !isConnected) {
+      logsDeviceRef.current = null;
+      setLogMessages([]);
+      setHistoryOldestSeq(null);
+      setHistoryLoading(false);
       return;
     }
 
-    setConversations(prev => {
-      const history = prev[device] ? [...prev[device]] : [];
-      history.push({
-        device,
-        direction,
-        payload,
-        origin,
-        ts: typeof ts === 'number' ? ts * 1000 : Date.now(),
+    logsDeviceRef.current = selectedDevice;
+    setLogMessages([]);
+    setHistoryOldestSeq(null);
+    setHistoryLoading(true);
+    socketService.requestHistory(selectedDevice, {}, (response = {}) => {
+      if (logsDeviceRef.current !== selectedDevice) {
+        return;
+      }
+      setHistoryLoading(false);
+      if (response.error) {
+        console.error('Error al obtener historial:', response.error);
+        return;
+      }
+      const page = (response.messages || []).map(toLogEntry);
+      setLogMessages(prev => {
+        // Conservar mensajes en vivo que llegaron después de la página
+        const lastSeq = page.length > 0 ? page[page.length - 1].seq : -1;
+        return [...page, ...prev.filter(m => m.seq > lastSeq)];
       });
-      if (history.length > 250) {
-        history.shift();
+      setHistoryOldestSeq(response.oldest_seq ?? null);
+    });
+  }, [isLogsOpen, selectedDevice, isConnected]);
+
+  // El cursor de la página anterior es el mensaje más antiguo que se muestra
+  const historyCursor = typeof logMessages[0]?.seq === 'number' ? logMessages[0].seq : null;
+  const hasOlderHistory = historyCursor !== null && historyOldestSeq !== null && historyCursor > historyOldestSeq;
+
+  const handleLoadOlderMessages = () => {
+    const device = logsDeviceRef.current;
+    if (!device || !hasOlderHistory || historyLoading) {
+      return;
+    }
+
+    setHistoryLoading(true);
+    socketService.requestHistory(device, { before: historyCursor }, (response = {}) => {
+      if (logsDeviceRef.current !== device) {
+        return;
+      }
+      setHistoryLoading(false);
+      if (response.error) {
+        console.error('Error al obtener historial:', response.error);
+        return;
       }
-      return {
-        ...prev,
-        [device]: history,
-      };
+      const page = (response.messages || []).map(toLogEntry);
+      setLogMessages(prev => [...page, ...prev]);
+      setHistoryOldestSeq(response.oldest_seq ?? null);
     });
+  };
+
+  const resetMotionState = useCallback(() => {
+    setMovementInput({ x: 0, y: 0 });
+    setRotationInput({ x: 0, y: 0 });
+    setSpeed(0);
+    setMovementLocked(false);
+    setRotationLocked(false);
+    setActiveMovement(null);
+    setActiveRotation(null);
   }, []);
 
   useEffect(() => {
@@ -91,12 +167,29 @@ function App() {
       console.error('Socket error:', err);
     };
 
+    const handleControlState = (data = {}) => {
+      setControlHolder(data.holder || null);
+    };
+
+    // El backend detiene el robot al quitarnos el control: reflejarlo en la interfaz
+    const handleControlRevoked = (data = {}) => {
+      console.warn(`⚠️ Control del robot perdido (${data.reason}${data.by ? `, lo tomó ${data.by}` : ''})`);
+      resetMotionState();
+    };
+
+    const handleControlDenied = (data = {}) => {
+      console.warn('⚠️ Comando rechazado:', data.message);
+    };
+
     // Registrar listeners
     socketService.on('connect', handleConnect);
     socketService.on('disconnect', handleDisconnect);
     socketService.on('device_list', handleDeviceList);
     socketService.on('conversation_message', handleConversationMessage);
     socketService.on('error', handleError);
+    socketService.on('control_state', handleControlState);
+    socketService.on('control_revoked', handleControlRevoked);
+    socketService.on('control_denied', handleControlDenied);
 
     return () => {
       // Limpiar listeners pero NO desconectar el socket
@@ -107,15 +200,38 @@ function App() {
       socketService.off('device_list', handleDeviceList);
       socketService.off('conversation_message', handleConversationMessage);
       socketService.off('error', handleError);
+      socketService.off('control_state', handleControlState);
+      socketService.off('control_revoked', handleControlRevoked);
+      socketService.off('control_denied', handleControlDenied);
       // NO llamar a disconnect() aquí para evitar desconexiones en React StrictMode
     };
-  }, [handleDeviceList, handleConversationMessage]);
+  }, [handleDeviceList, handleConversationMessage, resetMotionState]);
 
   const handleConnect = () => {
     console.log('Attempting to connect...');
     socketService.connect();
   };
 
+  // Renovar el control solo mientras haya un movimiento o giro activo
+  useEffect(() => {
+    socketService.setMotionActive(Boolean(activeMovement || activeRotation));
+  }, [activeMovement, activeRotation]);
+
+  // Otro operador tiene el control: este panel queda como observador
+  const hasControl = socketService.hasControl(controlHolder);
+  const isObserver = controlHolder !== null && !hasControl;
+
+  const handleToggleControl = () => {
+    if (hasControl) {
+      socketService.releaseControl();
+      return;
+    }
+    if (isObserver && !window.confirm(`${controlHolder} tiene el control. ¿Tomar el control? El robot se detendrá.`)) {
+      return;
+    }
+    socketService.requestControl(isObserver);
+  };
+
   const handleRefreshDevices = () => {
     console.log('Requesting device list...');
     socketService.requestDeviceList();
@@ -246,13 +362,7 @@ function App() {
     console.log('🛑 PARO DE EMERGENCIA: Deteniendo motores');
     
     // Resetear estado local INMEDIATAMENTE
-    setMovementInput({ x: 0, y: 0 });
-    setRotationInput({ x: 0, y: 0 });
-    setSpeed(0);
-    setMovementLocked(false);
-    setRotationLocked(false);
-    setActiveMovement(null);
-    setActiveRotation(null);
+    resetMotionState();
     
     // Enviar comando de paro al backend
     if (isConnected) {
@@ -268,10 +378,6 @@ function App() {
     }, 500);
   };
 
-  const currentConversation = useMemo(() => {
-    return selectedDevice ? conversations[selectedDevice] || [] : [];
-  }, [conversations, selectedDevice]);
-
   return (
     <div className="app">
       <Header 
@@ -284,6 +390,9 @@ function App() {
         onRefresh={handleRefreshDevices}
         onOpenLogs={() => setIsLogsOpen(true)}
         logsDisabled={!selectedDevice}
+        controlHolder={controlHolder}
+        hasControl={hasControl}
+        onToggleControl={handleToggleControl}
       />
 
       <div className="info-panel">
@@ -308,7 +417,7 @@ function App() {
               }
             }
           }}
-          disabled={!isConnected || !selectedDevice}
+          disabled={!isConnected || !selectedDevice || isObserver}
         />
         <Stats 
           movementInput={movementInput}
@@ -320,7 +429,7 @@ function App() {
         <div className="left-buttons">
           <MovementButtons 
             onMove={handleMovement}
-            disabled={!isConnected || !selectedDevice || rotationLocked || activeRotation}
+            disabled={!isConnected || !selectedDevice || isObserver || rotationLocked || activeRotation}
             onEmergencyStop={handleEmergencyStop}
             emergencyStopActive={emergencyStopActive}
             activeMovement={activeMovement}
@@ -332,7 +441,7 @@ function App() {
         <div className="right-buttons">
           <RotationButtons 
             onRotate={handleRotation}
-            disabled={!isConnected || !selectedDevice || movementLocked || activeMovement}
+            disabled={!isConnected || !selectedDevice || isObserver || movementLocked || activeMovement}
             activeRotation={activeRotation}
           />
         </div>
@@ -341,8 +450,11 @@ function App() {
       {isLogsOpen && (
         <LogsModal
           device={selectedDevice}
-          messages={currentConversation}
+          messages={logMessages}
           isConnected={isConnected}
+          hasMore={hasOlderHistory}
+          loading={historyLoading}
+          onLoadMore={handleLoadOlderMessages}
           onClose={() => setIsLogsOpen(false)}
         />
       )}
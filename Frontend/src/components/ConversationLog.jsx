@@ -5,7 +5,7 @@ function formatTimestamp(ts) {
   return date.toLocaleTimeString('es-MX', { hour: '2-digit', minute: '2-digit', second: '2-digit' });
 }
 
-function ConversationLog({ device, messages, isConnected }) {
+function ConversationLog({ device, messages, isConnected, hasMore = false, loading = false, onLoadMore }) {
   if (!device) {
     return (
       <div className="conversation-panel">
@@ -33,13 +33,15 @@ function ConversationLog({ device, messages, isConnected }) {
       </div>
       <div className="conversation-log">
         {messages.length === 0 ? (
-          <div className="conversation-empty">Sin mensajes con este dispositivo todavía.</div>
+          <div className="conversation-empty">
+            {loading ? 'Cargando historial...' : 'Sin mensajes con este dispositivo todavía.'}
+          </div>
         ) : (
           [...messages].reverse().map((msg, idx) => {
             const isFromDevice = msg.direction === 'from_device';
             return (
               <div
-                key={`${msg.ts}-${idx}`}
+                key={msg.seq ?? `${msg.ts}-${idx}`}
                 className={`conversation-entry ${isFromDevice ? 'from-device' : 'from-operator'}`}
               >
                 <div className="conversation-meta">
@@ -53,6 +55,11 @@ function ConversationLog({ device, messages, isConnected }) {
             );
           })
         )}
+        {hasMore && onLoadMore && (
+          <button className="conversation-load-more" onClick={onLoadMore} disabled={loading}>
+            {loading ? 'Cargando...' : 'Cargar mensajes anteriores'}
+          </button>
+        )}
       </div>
     </div>
   );
@@ -4,7 +4,7 @@ import ConnectionStatus from './ConnectionStatus';
 import DeviceSelector from './DeviceSelector';
 import logoITESO from '../Public/Logo-ITESO-Principal-SinFondo.png';
 
-function Header({ batteryLevel, isConnected, onConnect, devices, selectedDevice, onDeviceChange, onRefresh, onOpenLogs, logsDisabled }) {
+function Header({ batteryLevel, isConnected, onConnect, devices, selectedDevice, onDeviceChange, onRefresh, onOpenLogs, logsDisabled, controlHolder, hasControl, onToggleControl }) {
   const [currentTime, setCurrentTime] = useState(new Date());
   const [isFullscreen, setIsFullscreen] = useState(false);
 
@@ -72,6 +72,14 @@ function Header({ batteryLevel, isConnected, onConnect, devices, selectedDevice,
         >
           {isFullscreen ? <Minimize2 size={18} /> : <Maximize2 size={18} />}
         </button>
+        <button
+          className={`header-control-btn ${hasControl ? 'active' : ''}`}
+          onClick={onToggleControl}
+          disabled={!isConnected}
+          title={controlHolder ? `Control: ${controlHolder}` : 'Nadie tiene el control'}
+        >
+          {hasControl ? 'Liberar control' : 'Tomar control'}
+        </button>
         <button
           className="header-logs-btn"
           onClick={onOpenLogs}
@@ -1,7 +1,7 @@
 import { X } from 'lucide-react';
 import ConversationLog from './ConversationLog';
 
-function LogsModal({ device, messages, isConnected, onClose }) {
+function LogsModal({ device, messages, isConnected, hasMore, loading, onLoadMore, onClose }) {
   return (
     <div className="modal-backdrop" onClick={onClose}>
       <div className="modal-content" onClick={(e) => e.stopPropagation()}>
@@ -11,7 +11,14 @@ function LogsModal({ device, messages, isConnected, onClose }) {
             <X size={18} />
           </button>
         </div>
-        <ConversationLog device={device} messages={messages} isConnected={isConnected} />
+        <ConversationLog
+          device={device}
+          messages={messages}
+          isConnected={isConnected}
+          hasMore={hasMore}
+          loading={loading}
+          onLoadMore={onLoadMore}
+        />
       </div>
     </div>
   );
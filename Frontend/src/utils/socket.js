@@ -15,14 +15,42 @@ const BACKEND_URL = `http://${RASPBERRY_PI_IP}:5000`;
 // - Si accedes desde http://localhost:5173 → se conecta a http://localhost:5000 ✅
 // - El backend en 0.0.0.0:5000 acepta conexiones desde ambas IPs ✅
 
+// Muestreo de movimiento (joystick): en lugar de emitir cada mousemove/touchmove,
+// se toma el último estado a una cadencia fija y solo se envía si cambió lo suficiente.
+const MOVEMENT_BASE_INTERVAL_MS = 50; // Cadencia base (20 Hz)
+const MOVEMENT_MAX_INTERVAL_MS = 250; // Cadencia mínima aunque el RTT sea alto
+const MOVEMENT_DEADBAND = 0.05; // Cambio mínimo en x, y o rotation para reenviar
+const MOVEMENT_KEEPALIVE_MS = 1000; // Reenviar el estado sin cambios para mantener vivo el control
+const RTT_PROBE_INTERVAL_MS = 1000; // Cada cuánto pedir ack para medir el RTT
+const SLOW_DOWN_HOLD_MS = 5000; // Tiempo que se respeta un 'slow_down' del servidor
+const CONTROL_RENEW_INTERVAL_MS = 1000; // Renovación del control con un movimiento activo (TTL del backend: 3 s)
+
+const isZeroMovement = (sample) => sample.x === 0 && sample.y === 0 && sample.rotation === 0;
+
 class SocketService {
   constructor() {
     this.socket = null;
     this.connected = false;
     this.deviceName = 'ControlPanel';
+    this.registeredName = null; // Nombre único asignado por el backend al registrarse
+    this.controlRenewTimer = null;
+    this.hasControlLease = false; // Este panel tiene el control según 'control_state'
+    this.motionActive = false; // Hay un movimiento o giro activo (botones)
     this.listenersSetup = false; // Bandera para rastrear si los listeners básicos están configurados
     this.lastErrorTime = 0; // Para limitar la frecuencia de mensajes de error
     this.errorCooldown = 5000; // Mostrar error completo solo cada 5 segundos
+    this.movement = {
+      target: null, // Target de la muestra actual
+      current: null, // Última muestra recibida del joystick
+      lastSent: null, // Última muestra enviada al servidor
+      lastSentAt: 0,
+      ackPending: false, // Pedir 'command_sent' en el próximo envío
+      timer: null,
+      srtt: null, // RTT suavizado (ms)
+      lastProbeAt: 0,
+      serverMinInterval: 0, // Intervalo mínimo pedido por 'slow_down'
+      serverMinIntervalUntil: 0,
+    };
   }
 
   connect() {
@@ -132,6 +160,9 @@ class SocketService {
           console.warn('⚠️ Desconectado del servidor:', reason);
         }
         this.connected = false;
+        // El backend libera el control al desconectarse el operador
+        this.hasControlLease = false;
+        this._stopControlRenewal();
       });
 
       this.socket.on('reconnect_attempt', (attemptNumber) => {
@@ -149,6 +180,27 @@ class SocketService {
         this.connected = false;
       });
 
+      this.socket.on('registered', (data = {}) => {
+        this.registeredName = data.name || null;
+      });
+
+      this.socket.on('control_state', (data = {}) => {
+        this.hasControlLease = this.hasControl(data.holder);
+        this._updateControlRenewal();
+      });
+
+      this.socket.on('control_revoked', () => {
+        this.hasControlLease = false;
+        this._updateControlRenewal();
+      });
+
+      this.socket.on('slow_down', (data = {}) => {
+        const minInterval = Number(data.min_interval_ms) || 0;
+        console.warn(`🐢 El servidor pide reducir la tasa de envío (${minInterval} ms)`);
+        this.movement.serverMinInterval = minInterval;
+        this.movement.serverMinIntervalUntil = Date.now() + SLOW_DOWN_HOLD_MS;
+      });
+
       this.listenersSetup = true;
     }
 
@@ -156,6 +208,8 @@ class SocketService {
   }
 
   disconnect(force = false) {
+    this._stopMovementLoop();
+    this._stopControlRenewal();
     if (this.socket) {
       if (force) {
         // Desconexión forzada: remover todos los listeners y desconectar
@@ -171,8 +225,12 @@ class SocketService {
     }
   }
 
-  // Enviar comandos de movimiento a un target específico
-  sendMovement(target, x, y, rotation) {
+  // Enviar comandos de movimiento a un target específico.
+  // Se puede llamar en cada evento del joystick: las muestras se agrupan a una
+  // cadencia adaptativa y solo se envían si superan la zona muerta.
+  // El paro (0, 0, 0) siempre se envía de inmediato.
+  // options.ack: pedir confirmación 'command_sent' en el próximo envío muestreado.
+  sendMovement(target, x, y, rotation, { ack = false } = {}) {
     if (!this.socket || !this.connected) {
       console.warn('Socket no conectado');
       return;
@@ -182,17 +240,101 @@ class SocketService {
       return;
     }
 
+    const m = this.movement;
+    const sample = { x, y, rotation };
+    const targetChanged = m.target !== target;
+    m.target = target;
+    m.current = sample;
+    if (ack) {
+      m.ackPending = true;
+    }
+
+    if (isZeroMovement(sample)) {
+      this._stopMovementLoop();
+      this._emitMovement(target, sample);
+      return;
+    }
+
+    // Primera muestra tras estar detenido (o nuevo target): enviar sin esperar
+    if (targetChanged || !m.lastSent || isZeroMovement(m.lastSent)) {
+      this._emitMovement(target, sample);
+    }
+
+    if (!m.timer) {
+      m.timer = setTimeout(() => this._movementTick(), this._movementInterval());
+    }
+  }
+
+  // Intervalo actual entre muestras: base, limitado por RTT y por 'slow_down'
+  _movementInterval() {
+    const m = this.movement;
+    let interval = MOVEMENT_BASE_INTERVAL_MS;
+    if (m.srtt !== null) {
+      interval = Math.max(interval, m.srtt);
+    }
+    interval = Math.min(interval, MOVEMENT_MAX_INTERVAL_MS);
+    if (Date.now() < m.serverMinIntervalUntil) {
+      interval = Math.max(interval, m.serverMinInterval);
+    }
+    return interval;
+  }
+
+  _movementTick() {
+    const m = this.movement;
+    m.timer = null;
+    if (!m.current || isZeroMovement(m.current) || !this.socket || !this.connected) {
+      return;
+    }
+
+    const last = m.lastSent;
+    const changed = !last
+      || Math.abs(m.current.x - last.x) >= MOVEMENT_DEADBAND
+      || Math.abs(m.current.y - last.y) >= MOVEMENT_DEADBAND
+      || Math.abs(m.current.rotation - last.rotation) >= MOVEMENT_DEADBAND;
+
+    if (changed || Date.now() - m.lastSentAt >= MOVEMENT_KEEPALIVE_MS) {
+      this._emitMovement(m.target, m.current);
+    }
+
+    m.timer = setTimeout(() => this._movementTick(), this._movementInterval());
+  }
+
+  _stopMovementLoop() {
+    if (this.movement.timer) {
+      clearTimeout(this.movement.timer);
+      this.movement.timer = null;
+    }
+  }
+
+  _emitMovement(target, sample) {
+    const m = this.movement;
+    const now = Date.now();
+    const ack = m.ackPending;
+    m.ackPending = false;
     const payload = {
       type: 'movement',
       data: {
-        x: x,
-        y: y,
-        rotation: rotation,
-        timestamp: Date.now()
+        x: sample.x,
+        y: sample.y,
+        rotation: sample.rotation,
+        timestamp: now
       }
     };
+    const message = ack ? { target, payload, ack: true } : { target, payload };
+
+    m.lastSent = sample;
+    m.lastSentAt = now;
 
-    this.socket.emit('send_command', { target, payload });
+    // Pedir ack de Socket.IO de vez en cuando para medir el RTT
+    if (now - m.lastProbeAt >= RTT_PROBE_INTERVAL_MS) {
+      m.lastProbeAt = now;
+      this.socket.emit('send_command', message, () => {
+        const rtt = Date.now() - now;
+        m.srtt = m.srtt === null ? rtt : 0.8 * m.srtt + 0.2 * rtt;
+      });
+    } else {
+      this.socket.emit('send_command', message);
+    }
   }
 
   // Enviar comando con acción
@@ -215,6 +357,65 @@ class SocketService {
     this.socket.emit('set_speed', { speed_level: speedLevel });
   }
 
+  // Solicitar el control del robot (takeover: quitárselo al operador actual)
+  requestControl(takeover = false) {
+    if (!this.socket || !this.connected) {
+      console.warn('Socket no conectado');
+      return;
+    }
+    console.log(`📤 Solicitando control${takeover ? ' (takeover)' : ''}`);
+    this.socket.emit('request_control', { takeover });
+  }
+
+  // Liberar el control del robot
+  releaseControl() {
+    if (!this.socket || !this.connected) {
+      console.warn('Socket no conectado');
+      return;
+    }
+    this._stopControlRenewal();
+    this.socket.emit('release_control');
+  }
+
+  // Indica si este panel es quien tiene el control según un 'control_state'
+  hasControl(holder) {
+    return Boolean(holder) && holder === this.registeredName;
+  }
+
+  // Los botones envían un solo comando y el robot sigue moviéndose: mientras el
+  // movimiento esté activo se renueva el control sin tráfico de comandos.
+  // Sin movimiento, el control se libera solo al expirar el TTL.
+  setMotionActive(active) {
+    this.motionActive = active;
+    this._updateControlRenewal();
+  }
+
+  _updateControlRenewal() {
+    if (this.hasControlLease && this.motionActive) {
+      this._startControlRenewal();
+    } else {
+      this._stopControlRenewal();
+    }
+  }
+
+  _startControlRenewal() {
+    if (this.controlRenewTimer) {
+      return;
+    }
+    this.controlRenewTimer = setInterval(() => {
+      if (this.socket && this.connected) {
+        this.socket.emit('request_control', { takeover: false });
+      }
+    }, CONTROL_RENEW_INTERVAL_MS);
+  }
+
+  _stopControlRenewal() {
+    if (this.controlRenewTimer) {
+      clearInterval(this.controlRenewTimer);
+      this.controlRenewTimer = null;
+    }
+  }
+
   // Paro de emergencia (mantener compatibilidad)
   emergencyStop() {
     this.sendCommand('stop');
@@ -229,6 +430,21 @@ class SocketService {
     this.socket.emit('list_devices');
   }
 
+  // Solicitar una página del historial de conversación de un dispositivo
+  // options: { before, after, since, limit } (ver evento 'history' del backend)
+  requestHistory(device, options = {}, callback) {
+    if (!this.socket || !this.connected) {
+      console.warn('Socket no conectado');
+      callback?.({ error: 'Socket no conectado' });
+      return;
+    }
+    if (!device) {
+      callback?.({ error: 'Se requiere el campo device' });
+      return;
+    }
+    this.socket.emit('history', { device, ...options }, callback);
+  }
+
   // Suscribirse a eventos personalizados
   on(event, callback) {
     if (this.socket) {